@@ -2,55 +2,108 @@
 Example usage:
 >>> python custom_export.py /path/to/export/dir rach3 hand_landmarker_mp
 
-A JSON file will be created for each sample in the dataset. The JSON file will
-contain the following structure:
+By default a single JSONL file is created with one line per sample, which
+avoids an open/write/close cycle per sample and can be consumed as a
+stream; pass --format json for the legacy one-file-per-sample layout and
+--compress to gzip the JSONL output. Each sample record has the following
+structure:
 {
     "filename": "sample_name.mp4",
     "frames": [
         {
             "frame_number": 1,
-            "keypoints": [
-                {
-                    "label": "Left",
-                    "points": [[x, y], [x, y], ...]
-                },
-                ...
-            ]
+            "labels": ["Left", "Right"],
+            "points": [[[x, y], ...], [[x, y], ...]]
         },
         ...
     ]
 }
+
+"labels" and "points" are parallel: points[i] holds the 21 [x, y] pairs
+for labels[i], so numeric consumers can load each frame straight into a
+(num_hands, 21, 2) float32 array.
 """
 
-import json
+import os
 import argparse
+import gzip
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from tqdm import tqdm
+import numpy as np
+import orjson
 import fiftyone as fo
 
 
-def export(export_dir, dataset_name, field):
+def _write_one(payload):
+    """Serializes and writes one sample dump (runs in a worker process)."""
+    fpath, dump = payload
+    with open(fpath, "wb") as f:
+        f.write(orjson.dumps(dump, option=orjson.OPT_SERIALIZE_NUMPY))
+
+
+def export(export_dir, dataset_name, field, format="jsonl", compress=False):
     dataset = fo.load_dataset(dataset_name)
-    for sample in tqdm(dataset):
+    export_dir = Path(export_dir)
+    export_dir.mkdir(exist_ok=True, parents=True)
+
+    # Pull everything in one aggregation round-trip; this skips hydrating
+    # every frame into a Sample/Frame object, which dominates export time
+    filepaths, frame_numbers, labels, points = dataset.values(
+        [
+            "filepath",
+            "frames.frame_number",
+            f"frames.{field}.keypoints.label",
+            f"frames.{field}.keypoints.points",
+        ]
+    )
+
+    dumps = []
+    for filepath, fns, kp_labels, kp_points in zip(
+        filepaths, frame_numbers, labels, points
+    ):
+        filename = os.path.basename(filepath)
         dump = {
-            "filename": str(Path(sample.filepath).name),
+            "filename": filename,
             "frames": [
                 {
                     "frame_number": frame_number,
-                    "keypoints": [
-                        {"label": kp.label, "points": kp.points}
-                        for kp in frame[field].keypoints
-                    ],
+                    # SoA layout: no per-keypoint dict, and orjson
+                    # serializes the float32 array natively
+                    "labels": frame_labels,
+                    "points": np.asarray(frame_points, dtype=np.float32),
                 }
-                for frame_number, frame in sample.frames.items()
+                for frame_number, frame_labels, frame_points in zip(
+                    fns, kp_labels, kp_points
+                )
             ],
         }
 
-        Path(export_dir).mkdir(exist_ok=True, parents=True)
-        fname = Path(sample.filepath).stem
-        fpath = Path(export_dir) / f"{fname}.json"
-        with open(str(fpath), "w", encoding="utf-8") as f:
-            json.dump(dump, f)
+        dumps.append(dump)
+
+    if format == "json":
+        # legacy layout: one file per sample; samples are independent,
+        # so fan the encode + write out across cores
+        # plain string joins; no Path object per sample
+        payloads = [
+            (os.path.join(export_dir, f"{os.path.splitext(d['filename'])[0]}.json"), d)
+            for d in dumps
+        ]
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+            list(
+                tqdm(
+                    executor.map(_write_one, payloads, chunksize=16),
+                    total=len(payloads),
+                )
+            )
+        return
+
+    # one JSONL stream: a single open/close pair for the whole dataset
+    fname = f"{dataset_name}.jsonl.gz" if compress else f"{dataset_name}.jsonl"
+    opener = gzip.open if compress else open
+    with opener(export_dir / fname, "wb") as f:
+        for dump in tqdm(dumps):
+            f.write(orjson.dumps(dump, option=orjson.OPT_SERIALIZE_NUMPY) + b"\n")
 
 
 def parse_args():
@@ -58,6 +111,8 @@ def parse_args():
     parser.add_argument("export_dir", type=str)
     parser.add_argument("dataset_name", type=str)
     parser.add_argument("field", type=str)
+    parser.add_argument("--format", type=str, choices=["json", "jsonl"], default="jsonl")
+    parser.add_argument("--compress", action="store_true")
     return parser.parse_args()
 
 
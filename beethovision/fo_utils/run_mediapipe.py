@@ -13,27 +13,21 @@ Usage:
         --seed 0x5EED
 """
 
-import urllib.request
 import argparse
+import multiprocessing
+import os
+import queue
+import subprocess
+import threading
 from tqdm import tqdm
-import cv2
+import requests
+import numpy as np
+import ffmpegcv
 import fiftyone as fo
 import mediapipe as mp
 from mediapipe import solutions
 
 
-class DownloadProgressBar(tqdm):
-    """
-    A progress bar for downloads.
-    """
-
-    def update_to(self, b=1, bsize=1, tsize=None):
-        """Update the progress bar."""
-        if tsize is not None:
-            self.total = tsize
-        self.update(b * bsize - self.n)
-
-
 def add_default_keypoint_skeleton(dataset: fo.Dataset):
     """
     Adds a default skeleton to the dataset.
@@ -48,28 +42,50 @@ def add_default_keypoint_skeleton(dataset: fo.Dataset):
     dataset.save()  # must save after edits
 
 
-def download_model_asset():
+def download_model_asset(use_gpu: bool = False):
     """
     Downloads the model asset for the hand landmarker.
 
+    Args:
+        use_gpu (bool, optional): Whether the GPU delegate will be used;
+            selects the float32 model variant. Defaults to False.
+
     Returns:
         str: The path to the model asset.
     """
-    url = "https://storage.googleapis.com/mediapipe-models/hand_landmarker/hand_landmarker/float16/latest/hand_landmarker.task"
-    output_path = "hand_landmarker.task"
-    with DownloadProgressBar(
-        unit="B", unit_scale=True, miniters=1, desc=url.split("/")[-1]
-    ) as t:
-        urllib.request.urlretrieve(url, filename=output_path, reporthook=t.update_to)
+    variant = "float32" if use_gpu else "float16"
+    url = f"https://storage.googleapis.com/mediapipe-models/hand_landmarker/hand_landmarker/{variant}/latest/hand_landmarker.task"
+    output_path = f"hand_landmarker_{variant}.task"
+
+    # repeated runs skip the download entirely
+    if os.path.exists(output_path):
+        return output_path
+
+    # stream into a temp file and rename on success, so an interrupted
+    # download can never be mistaken for a complete model
+    tmp_path = output_path + ".part"
+    with requests.get(url, stream=True, timeout=30) as r:
+        r.raise_for_status()
+        total = int(r.headers.get("content-length", 0))
+        with tqdm(
+            total=total, unit="B", unit_scale=True, miniters=1, desc=url.split("/")[-1]
+        ) as t, open(tmp_path, "wb") as f:
+            # 1 MiB chunks keep the socket saturated on fast links
+            for chunk in r.iter_content(chunk_size=1 << 20):
+                f.write(chunk)
+                t.update(len(chunk))
+    os.replace(tmp_path, output_path)
     return output_path
 
 
-def get_landmarker_options(model_asset_path):
+def get_landmarker_options(model_asset_path, use_gpu: bool = False):
     """
     Returns the options for the hand landmarker.
 
     Args:
         model_asset_path (str): The path to the model asset.
+        use_gpu (bool, optional): Whether to run the landmark CNN on the
+            GPU delegate. Defaults to False.
 
     Returns:
         mp.tasks.vision.HandLandmarkerOptions: The options for the hand landmarker.
@@ -78,9 +94,11 @@ def get_landmarker_options(model_asset_path):
     HandLandmarkerOptions = mp.tasks.vision.HandLandmarkerOptions
     VisionRunningMode = mp.tasks.vision.RunningMode
 
+    delegate = BaseOptions.Delegate.GPU if use_gpu else BaseOptions.Delegate.CPU
+
     # Create a hand landmarker instance with the video mode:
     return HandLandmarkerOptions(
-        base_options=BaseOptions(model_asset_path=model_asset_path),
+        base_options=BaseOptions(model_asset_path=model_asset_path, delegate=delegate),
         running_mode=VisionRunningMode.VIDEO,
         num_hands=2,
     )
@@ -118,12 +136,100 @@ def detect_hands(video_frame, frame_timestamp_ms, hand_landmarker):
     return keypoints
 
 
+# poison pill used to shut down the pipeline stages
+_SENTINEL = None
+
+
+def _decode_frames(cap, frame_numbers, timestamps, out_queue):
+    """Decoder stage: reads + converts frames and feeds the inference stage."""
+    try:
+        for frame_number, frame_timestamp_ms in zip(frame_numbers, timestamps):
+            success, video_frame = cap.read()
+            if not success:
+                break
+            out_queue.put((frame_number, video_frame, frame_timestamp_ms))
+    except Exception as exc:  # pylint: disable=broad-except
+        out_queue.put(exc)  # forwarded downstream and re-raised in run_mp
+    finally:
+        out_queue.put(_SENTINEL)
+
+
+def _decode_selected_frames(
+    filepath, frame_numbers, timestamps, width, height, out_queue
+):
+    """
+    Decoder stage for frame subsets: a single ffmpeg process with a
+    select filter extracts only the wanted frames, instead of
+    sequentially decoding (and discarding) every frame in the video.
+    """
+    # ffmpeg frame indices are 0-based, fiftyone frames are 1-indexed
+    select = "+".join(f"eq(n,{fn - 1})" for fn in frame_numbers)
+    cmd = [
+        "ffmpeg",
+        "-nostdin",
+        "-loglevel",
+        "error",
+        "-i",
+        filepath,
+        "-vf",
+        f"select='{select}',setpts=N/TB",
+        "-f",
+        "rawvideo",
+        "-pix_fmt",
+        "rgb24",
+        "pipe:1",
+    ]
+    frame_bytes = width * height * 3
+    try:
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE) as proc:
+            for frame_number, frame_timestamp_ms in zip(frame_numbers, timestamps):
+                buf = proc.stdout.read(frame_bytes)
+                if len(buf) < frame_bytes:
+                    break
+                video_frame = np.frombuffer(buf, dtype=np.uint8).reshape(
+                    height, width, 3
+                )
+                out_queue.put((frame_number, video_frame, frame_timestamp_ms))
+    except Exception as exc:  # pylint: disable=broad-except
+        out_queue.put(exc)  # forwarded downstream and re-raised in run_mp
+    finally:
+        out_queue.put(_SENTINEL)
+
+
+def _detect_frames(landmarker, in_queue, out_queue):
+    """Inference stage: runs the landmarker on decoded frames in order."""
+    error = None
+    while True:
+        item = in_queue.get()
+        if item is _SENTINEL:
+            break
+        if error is not None:
+            continue  # keep draining so the decoder never blocks on put
+        if isinstance(item, Exception):
+            error = item
+            continue
+        frame_number, video_frame, frame_timestamp_ms = item
+        try:
+            keypoints = detect_hands(video_frame, frame_timestamp_ms, landmarker)
+        except Exception as exc:  # pylint: disable=broad-except
+            error = exc
+            continue
+        out_queue.put((frame_number, keypoints))
+    if error is not None:
+        out_queue.put(error)  # re-raised in run_mp
+    out_queue.put(_SENTINEL)
+
+
 def run_mp(
     dataset: fo.Dataset, options: mp.tasks.vision.HandLandmarkerOptions, field_name: str
 ):
     """
     Runs the hand landmarker on the dataset.
 
+    Decode, inference, and the FiftyOne writes run as a three-stage
+    producer-consumer pipeline so throughput is bounded by the slowest
+    stage (MediaPipe inference) rather than the sum of all three.
+
     Args:
         dataset (fo.Dataset): The dataset to run the hand landmarker on.
         options (mp.tasks.vision.HandLandmarkerOptions): hand landmarker options.
@@ -131,24 +237,124 @@ def run_mp(
     """
     HandLandmarker = mp.tasks.vision.HandLandmarker
 
-    for sample in tqdm(dataset):
-        cap = cv2.VideoCapture(sample.filepath)
-        n_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-
-        with HandLandmarker.create_from_options(options) as landmarker:
-            for frame_number, frame in tqdm(
-                sample.frames.items(), total=n_frames, leave=False
-            ):
-                success, video_frame = cap.read()
-                if not success:
-                    break
-                video_frame = cv2.cvtColor(video_frame, cv2.COLOR_BGR2RGB)
-                frame_timestamp_ms = int(1000 / fps * frame_number)
+    # create the landmarker once; reloading the TFLite model per video
+    # costs hundreds of ms. VIDEO mode requires monotonically increasing
+    # timestamps across detect_for_video calls, so each video is offset
+    # by the running duration of the previous ones.
+    base_ts_ms = 0
+    with HandLandmarker.create_from_options(options) as landmarker:
+        for sample in tqdm(dataset):
+            # rgb24 output comes straight from FFmpeg's swscale, so no
+            # per-frame BGR->RGB copy is needed on the Python side
+            cap = ffmpegcv.VideoCapture(sample.filepath, pix_fmt="rgb24")
+            n_frames = cap.count
+            fps = cap.fps
+            frame_numbers = list(sample.frames.keys())
+            if not frame_numbers:
+                # no frame docs to fill; an empty select filter would
+                # also make ffmpeg error out
+                cap.release()
+                continue
+
+            # integer-ms timestamps precomputed once per video; integer
+            # arithmetic drops the per-frame float division and cannot
+            # produce the duplicate timestamps that VIDEO mode silently
+            # rejects (strictly increasing for any fps < 1000)
+            fps_mhz = int(fps * 1000)
+            timestamps = [
+                base_ts_ms + fn * 1_000_000 // fps_mhz for fn in frame_numbers
+            ]
+
+            decode_queue = queue.Queue(maxsize=8)
+            result_queue = queue.Queue(maxsize=8)
+
+            if len(frame_numbers) < n_frames:
+                # only a subset of frames is wanted; extract just those
+                # with a select filter instead of decoding everything
+                width, height = cap.width, cap.height
+                cap.release()
+                cap = None
+                decoder = threading.Thread(
+                    target=_decode_selected_frames,
+                    args=(
+                        sample.filepath,
+                        frame_numbers,
+                        timestamps,
+                        width,
+                        height,
+                        decode_queue,
+                    ),
+                    daemon=True,
+                )
+            else:
+                decoder = threading.Thread(
+                    target=_decode_frames,
+                    args=(cap, frame_numbers, timestamps, decode_queue),
+                    daemon=True,
+                )
+
+            threads = [
+                decoder,
+                threading.Thread(
+                    target=_detect_frames,
+                    args=(landmarker, decode_queue, result_queue),
+                    daemon=True,
+                ),
+            ]
+            for thread in threads:
+                thread.start()
+
+            # writer stage: accumulate results, then write in bulk below
+            kps_by_frame = {}
+            error = None
+            with tqdm(total=len(frame_numbers), leave=False) as pbar:
+                while True:
+                    item = result_queue.get()
+                    if item is _SENTINEL:
+                        break
+                    if isinstance(item, Exception):
+                        error = item
+                        continue
+                    frame_number, keypoints = item
+                    kps_by_frame[frame_number] = fo.Keypoints(keypoints=keypoints)
+                    pbar.update()
+
+            for thread in threads:
+                thread.join()
+
+            # re-raise stage failures rather than committing partial results
+            if error is not None:
+                raise error
+
+            # one bulk frame write per video instead of per-frame BSON
+            # serialization through sample.save()
+            frame_numbers = sorted(kps_by_frame)
+            dataset.select(sample.id).set_values(
+                f"frames.{field_name}",
+                [[kps_by_frame[fn] for fn in frame_numbers]],
+            )
 
-                keypoints = detect_hands(video_frame, frame_timestamp_ms, landmarker)
-                frame[field_name] = fo.Keypoints(keypoints=keypoints)
-            sample.save()
+            base_ts_ms += (n_frames + 1) * 1_000_000 // fps_mhz
+            if cap is not None:
+                cap.release()
+
+
+def _process_shard(args):
+    """
+    Runs the hand landmarker on a shard of sample ids (worker process).
+
+    Args:
+        args (tuple): (dataset_name, sample_ids, model_asset_path,
+            field_name, use_gpu).
+    """
+    dataset_name, sample_ids, model_asset_path, field_name, use_gpu = args
+    # each worker reconnects to FiftyOne and builds its own landmarker
+    dataset = fo.load_dataset(dataset_name)
+    run_mp(
+        dataset.select(sample_ids),
+        get_landmarker_options(model_asset_path, use_gpu=use_gpu),
+        field_name=field_name,
+    )
 
 
 def parse_args():
@@ -168,6 +374,9 @@ def parse_args():
     parser.add_argument(
         "--seed", type=int, default=0x5EED, help="Random seed for sampling."
     )
+    parser.add_argument(
+        "--use-gpu", action="store_true", help="Run inference on the GPU delegate."
+    )
     return parser.parse_args()
 
 
@@ -177,6 +386,7 @@ def main(
     keypoints_field: str,
     num_samples: int,
     seed: int,
+    use_gpu: bool,
 ):
     """
     The main function of the script.
@@ -187,6 +397,7 @@ def main(
         keypoints_field (str): The name of the field to store the keypoints in.
         num_samples (int): The number of samples to process.
         seed (int): The random seed for sampling.
+        use_gpu (bool): Whether to run inference on the GPU delegate.
     """
     print(f"📂 Loading dataset '{dataset_name}'")
     dataset: fo.Dataset = fo.load_dataset(dataset_name)
@@ -195,7 +406,7 @@ def main(
     add_default_keypoint_skeleton(dataset)
 
     if not model_asset_path:
-        model_asset_path = download_model_asset()
+        model_asset_path = download_model_asset(use_gpu=use_gpu)
 
     if num_samples > 0:
         print(f"Sampling {num_samples} samples with seed {seed}")
@@ -205,11 +416,22 @@ def main(
     print(f"   - Model asset path: {model_asset_path}")
     print(f"   - Keypoints field: {keypoints_field}")
     print("💫 This may take a while...")
-    run_mp(
-        dataset,
-        get_landmarker_options(model_asset_path),
-        field_name=keypoints_field,
-    )
+
+    if not dataset:
+        print("Nothing to process")
+        return
+
+    # videos are independent, so shard them across worker processes;
+    # cpu_count() can return None on exotic platforms
+    num_workers = min(os.cpu_count() or 1, len(dataset))
+    sample_ids = dataset.values("id")
+    shards = [sample_ids[i::num_workers] for i in range(num_workers)]
+    worker_args = [
+        (dataset_name, shard, model_asset_path, keypoints_field, use_gpu)
+        for shard in shards
+    ]
+    with multiprocessing.get_context("spawn").Pool(num_workers) as pool:
+        pool.map(_process_shard, worker_args)
 
 
 if __name__ == "__main__":